@@ -1,14 +1,102 @@
 import os
 import fire
 import shutil
+import subprocess
+import tarfile
+import zipfile
 from alive_progress import alive_bar
-from validator import is_dir, is_bool
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from validator import is_dir, is_bool, is_positive_number, is_in_range
 from utils import show_info, setup_logger, UserResponse, ask
 
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
 logger = setup_logger(__name__)
 
-SUPPORTED_FORMAT_TYPES = ['zip']
+# Used when the zstandard package is not installed
+ZSTD_COMMAND = shutil.which('zstd')
+
+
+def make_zip(base_name: str, root_dir: str, compress_level: int = None) -> str:
+    """Compress the files in the given directory to a ZIP file.
+
+    Args:
+        base_name (str): Path of the archive without the extension.
+        root_dir (str): Directory to compress.
+        compress_level (int): Deflate compression level(0-9). Defaults to zlib's default.
+
+    Returns:
+        str: Path of the created archive.
+    """
+    archive_filename = base_name + '.zip'
+    with zipfile.ZipFile(archive_filename, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compress_level) as zip_file:
+        for current_dir, dirs, files in os.walk(root_dir):
+            dirs.sort()
+            for name in dirs + sorted(files):
+                path = os.path.join(current_dir, name)
+                zip_file.write(path, os.path.relpath(path, root_dir))
+
+    return archive_filename
+
+
+def make_tarzst(base_name: str, root_dir: str, compress_level: int = None, threads: int = 0) -> str:
+    """Compress the files in the given directory to a Zstandard compressed tar file.
+
+    Use the zstandard package if installed, the zstd command otherwise.
+
+    Args:
+        base_name (str): Path of the archive without the extension.
+        root_dir (str): Directory to compress.
+        compress_level (int): Zstandard compression level(1-22). Defaults to 3.
+        threads (int): Number of threads to compress with. Defaults to 0, which uses all CPUs.
+
+    Returns:
+        str: Path of the created archive.
+    """
+    archive_filename = base_name + '.tar.zst'
+    if not compress_level:
+        compress_level = 3
+
+    def add_files(fileobj):
+        with tarfile.open(fileobj=fileobj, mode='w|') as tar:
+            for name in sorted(os.listdir(root_dir)):
+                tar.add(os.path.join(root_dir, name), arcname=name)
+
+    if zstandard:
+        # zstandard uses -1 for all CPUs, and 0 for compressing in the calling thread only
+        if threads == 0:
+            zstandard_threads = -1
+        elif threads == 1:
+            zstandard_threads = 0
+        else:
+            zstandard_threads = threads
+        compressor = zstandard.ZstdCompressor(level=compress_level, threads=zstandard_threads)
+        with open(archive_filename, 'wb') as fp, compressor.stream_writer(fp) as writer:
+            add_files(writer)
+    else:
+        command = [ZSTD_COMMAND, f'-T{threads}', f'-{compress_level}', '-q', '-f', '-o', archive_filename]
+        if compress_level > 19:
+            command.insert(1, '--ultra')
+        with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+            add_files(process.stdin)
+            process.stdin.close()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+    return archive_filename
+
+
+ARCHIVERS = {
+    'zip': (make_zip, 0, 9),
+    'tzst': (make_tarzst, 1, 22),
+}
+
+SUPPORTED_FORMAT_TYPES = list(ARCHIVERS)
 
 
 class CompressDir():
@@ -17,6 +105,8 @@ class CompressDir():
             input_dir: str = '',
             output_dir: str = '',
             format_type: str = 'zip',
+            compress_level: int = None,
+            workers: int = 0,
             yes: bool = False
     ):
         """Initialize
@@ -25,6 +115,8 @@ class CompressDir():
             input_dir (str): Target directory. Defaults to ''.
             output_dir (str): Output directory. Default is the same as input_dir.
             format_type (str): Compressed file format type. Defaults to 'zip'.
+            compress_level (int): Compression level. Default is the format's default level.
+            workers (int): Number of processes to compress with. Default is the number of CPUs.
             yes (bool): Flag for asking to execute or not. Defaults to False.
         """
         self.input_dir: str = input_dir
@@ -33,6 +125,11 @@ class CompressDir():
         else:
             self.output_dir = input_dir
         self.format_type = format_type.lower()
+        self.compress_level = compress_level
+        if workers:
+            self.workers = workers
+        else:
+            self.workers = os.cpu_count() or 1
         self.yes: bool = yes
 
     def _input_is_valid(self) -> bool:
@@ -63,6 +160,26 @@ class CompressDir():
                 f'You must type a valid format type. The supported format types are {",".join(SUPPORTED_FORMAT_TYPES)}. (-f, --format_type)'
             )
             is_valid = False
+        elif self.format_type == 'tzst' and not zstandard and not ZSTD_COMMAND:
+            logger.error(
+                'You must install the zstandard package or the zstd command to use tzst. (-f, --format_type)'
+            )
+            is_valid = False
+        else:
+            # Check compress_level
+            _, min_level, max_level = ARCHIVERS[self.format_type]
+            if self.compress_level is not None and not is_in_range(self.compress_level, min_level, max_level):
+                logger.error(
+                    f'You must type a number between {min_level} and {max_level} for COMPRESS LEVEL. (-c, --compress_level)'
+                )
+                is_valid = False
+
+        # Check workers
+        if not is_positive_number(self.workers):
+            logger.error(
+                'You must type a positive number for WORKERS. (-w, --workers)'
+            )
+            is_valid = False
 
         # Check yes
         if not is_bool(self.yes):
@@ -82,15 +199,24 @@ class CompressDir():
         Description:
             Compress each directories directly below to the given input directory.
             The default compress file format is ZIP.
+            TZST requires the zstandard package or the zstd command.
 
         Options:
             -o, --output_dir <path/to/dir>      Where the compressed file will be output.
                                                 If this option was not specified, it will be the same as input directory(-i, --input_dir).
 
             -f, --format_type <format-type>     What kind of format to use.
-                                                The avaliable format types is zip only.
+                                                The avaliable format types are zip and tzst.
                                                 If this option was not specified, it will be set to ZIP.
 
+            -c, --compress_level <number>       Compression level. Lower is faster, higher is smaller.
+                                                The range is 0-9 for zip and 1-22 for tzst.
+                                                If this option was not specified, the format's default level is used.
+
+            -w, --workers <number>              How many directories to compress in parallel.
+                                                If this option was not specified, it will be the number of CPUs.
+                                                For tzst, the CPUs are split between the archives compressed at the same time.
+
             -y, --yes                           Execute immediately without asking.
         """
         show_info(self)
@@ -98,7 +224,11 @@ class CompressDir():
             logger.info('Input parameter is not valid. Try again.')
             return
 
-        dirs = os.listdir(self.input_dir)
+        # Compress directories only, files such as the archives created before are skipped
+        dirs = [
+            directory for directory in os.listdir(self.input_dir)
+            if os.path.isdir(os.path.join(self.input_dir, directory))
+        ]
         total_dirs = len(dirs)
         logger.info(f'{total_dirs} directories will be executed.')
 
@@ -110,16 +240,39 @@ class CompressDir():
 
         logger.info('Start Compressing each directories...')
 
-        with alive_bar(total_dirs, bar='filling', spinner='dots_waves') as bar:
-            for i, directory in enumerate(dirs):
-                logger.info(f'Compressing {directory}')
-                compressed_filename = shutil.make_archive(
+        archiver = ARCHIVERS[self.format_type][0]
+        archiver_options = {}
+        if self.format_type == 'tzst':
+            # Split the CPUs between the archives compressed at the same time, or it will be CPUs x CPUs threads
+            running_workers = max(1, min(self.workers, total_dirs))
+            archiver_options['threads'] = max(1, (os.cpu_count() or 1) // running_workers)
+        failed_dirs = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for directory in dirs:
+                future = executor.submit(
+                    archiver,
                     base_name=os.path.join(self.output_dir, directory),
-                    format=self.format_type,
-                    root_dir=os.path.join(self.output_dir, directory)
+                    root_dir=os.path.join(self.input_dir, directory),
+                    compress_level=self.compress_level,
+                    **archiver_options
                 )
-                logger.info(f'Compress complete! The {self.format_type} file is located at {compressed_filename}')
-                bar()
+                futures[future] = directory
+
+            with alive_bar(total_dirs, bar='filling', spinner='dots_waves') as bar:
+                for future in as_completed(futures):
+                    directory = futures[future]
+                    try:
+                        compressed_filename = future.result()
+                    except Exception as e:
+                        logger.error(f'Exception occurred in compressing {directory}: {e}')
+                        failed_dirs.append(directory)
+                    else:
+                        logger.info(f'Compress complete! {directory} -> {compressed_filename}')
+                    bar()
+
+        if failed_dirs:
+            logger.error(f'{len(failed_dirs)} directories could not be compressed: {", ".join(failed_dirs)}')
 
         logger.info('Abort...')
 
@@ -1,19 +1,74 @@
-import epub_meta
 import fire
-import glob
+import json
 import os
 import re
+import shelve
 import shutil
+import tempfile
+import threading
 import time
 import zipfile
 from alive_progress import alive_bar
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
 from lxml import etree
+from typing import Optional
 from utils import setup_logger
 from validator import is_dir, is_bool, is_file
 
 logger = setup_logger(__name__)
 
+# Translation tables and patterns used to format the book title and the author
+_FW_ALNUM_TABLE = str.maketrans({
+    c: c - 0xFEE0 for c in [*range(ord('Ａ'), ord('Ｚ') + 1), *range(ord('ａ'), ord('ｚ') + 1), *range(ord('０'), ord('９') + 1)]
+})
+_UNSAFE_SYM_TABLE = str.maketrans({ord(c): ord(c) + 0xFEE0 for c in '<>:"/\\|!?*'})
+_FW_BRACKETS_TABLE = str.maketrans({ord('（'): ord('('), ord('）'): ord(')')})
+_PAREN_NUM_RE = re.compile(r'\s*\(\s*(\d+)\s*\)(?:\s*(?=(\.epub))|\s+)')
+_KANJI_MAP = {
+    '壱': '1', '弐': '2', '参': '3', '肆': '4', '伍': '5',
+    '陸': '6', '漆': '7', '捌': '8', '玖': '9', '拾': '10', '什': '10'
+}
+_KANJI_RE = re.compile(r'\s*([壱弐参肆伍陸漆捌玖拾什])\s*巻?\s*')
+_STRIP_RE = re.compile(
+    r'【[^】]*?(?:付き|増量版|無料版?|出版|誌版|特別版?|特典付き?|漫画付き?)】'
+    r'|[(＜〈][^)〉＞]*?(?:BOOKS|Creative|DX版?|GAMES|JOKER|Network|NOVELS|NOVEL 0|Publishing|エイジ|エクストラ|コミック|シリーズ|ス|ノベルズ|ラノベ|限定版|小説|新装版|電子版|特典付き|特別版|文芸|文庫J?|編集部)[)〉＞]'
+)
+_COLON_RE = re.compile(r'[：:]')
+_CIRCLED_RE = re.compile(r'\s*([①-⑨⑴-⑼⒈-⒐⓵-⓽])\s*巻?\s*')
+_TRAIL_NUM_RE = re.compile(r'\s*(\d+)巻?\s*(?=\.epub)')
+_WS_RE = re.compile(r'\s+')
+_WS_BEFORE_EXT_RE = re.compile(r'\s+(\.epub)?')
+_AUTHOR_SPACE_RE = re.compile(r'( |　)')
+
+# Parser and queries for EPub's OPF container XML, created once per thread
+_OPF_NAMESPACES = {
+    'ns': 'http://www.idpf.org/2007/opf',
+    'dc': 'http://purl.org/dc/elements/1.1/'
+}
+_CONTAINER_NAMESPACES = {
+    'n': 'urn:oasis:names:tc:opendocument:xmlns:container'
+}
+_opf_thread_local = threading.local()
+_CONTAINER_XML_PATH = 'META-INF/container.xml'
+
+# On-disk cache of get_epub_info results, keyed by the absolute path of EPub file
+_EPUB_INFO_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'epub_info')
+
+# Images to extract from EPub file
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+_EXCLUDE_IMAGE_RE = re.compile(r'[\\/]public(?:image|_image| image)s?')
+
+# Buffer size for copying an image from EPub file to disk
+_EXTRACT_BUFFER_SIZE = 1024 * 1024
+# Characters illegal in filenames on Windows, replaced when extracting
+_WINDOWS_ILLEGAL_CHARS_TABLE = str.maketrans(':<>|"?*', '_______')
+# Maximum number of images extracted by a thread at a time
+_EXTRACT_CHUNK_SIZE = 32
+# Renaming is retried a few times, since the directory may be locked for a moment(e.g. by anti-virus software on Windows)
+_REPLACE_TRIES = 3
+_REPLACE_RETRY_INTERVAL = 0.5
+
 
 class Platform(Enum):
     """Platform enum."""
@@ -31,7 +86,7 @@ def replace_fullwidth_alpha_numeral_to_halfwidth(text: str):
     Returns:
         str: Replaced text.
     """
-    return re.sub(r'[Ａ-Ｚａ-ｚ０-９]', lambda mathobj: chr(ord(mathobj.group(0)) - 0xFEE0), text)
+    return text.translate(_FW_ALNUM_TABLE)
 
 
 def replace_unsafe_symbol_to_safe_symbol(text: str):
@@ -58,7 +113,7 @@ def replace_unsafe_symbol_to_safe_symbol(text: str):
     Note:
         `!` is a valid character, but I'll adjust to `?`.
     """
-    return re.sub(r'[<>:"\/\\|!?*]', lambda mathobj: chr(ord(mathobj.group(0)) + 0xFEE0), text)
+    return text.translate(_UNSAFE_SYM_TABLE)
 
 
 def replace_fullwidth_round_brackets_to_halfwidth(text: str):
@@ -75,7 +130,7 @@ def replace_fullwidth_round_brackets_to_halfwidth(text: str):
     Returns:
         str: Replaced text.
     """
-    return re.sub(r'[（）]', lambda mathobj: chr(ord(mathobj.group(0)) - 0xFEE0), text)
+    return text.translate(_FW_BRACKETS_TABLE)
 
 
 def pad_numeric_only_string_enclosed_in_round_brackets(text: str):
@@ -94,37 +149,50 @@ def pad_numeric_only_string_enclosed_in_round_brackets(text: str):
     Returns:
         text (str): Padded text.
     """
-    match_result = re.search(r'\s*\(\s*(\d+)\s*\)\s+', text)
-    if match_result:
-        number = f' {str(int(match_result.group(1))).zfill(2)} '
-        text = re.sub(r'\s*\(\s*\d+\s*\)\s*', number, text)
-
-    match_result = re.search(r'\s*\(\s*(\d+)\s*\)\s*\.epub', text)
-    if match_result:
-        number = f' {str(int(match_result.group(1))).zfill(2)}'
-        text = re.sub(r'\s*\(\s*\d+\s*\)\s*(?=\.epub)', number, text)
-
-    return text
+    return _PAREN_NUM_RE.sub(
+        lambda match_obj: f' {int(match_obj.group(1)):02d}' + ('' if match_obj.group(2) else ' '),
+        text
+    )
 
 
 def pad_kanji_number(text: str):
     """
     Pad kanji number.
 
+    Example:
+        xxx 壱巻 yyy.epub -> xxx 1 yyy.epub
+        xxx拾.epub        -> xxx 10 .epub
+
     Args:
         text (str): Text to pad.
 
     Returns:
         text (str): Padded text.
     """
-    kanji_numbers = ['壱', '弐', '参', '肆', '伍', '陸', '漆', '捌', '玖', '拾', '什']
-    kanji_mapping = dict(zip(kanji_numbers, list(map(str, range(1, 11))) + ['10']))
-    match_result = re.search(r'\s*([' + '|'.join(kanji_numbers) + r'])\s*巻?\s*', text)
-    if match_result:
-        number = f' {kanji_mapping.get(match_result.group(1))} '
-        text = re.sub(r'\s*[' + '|'.join(kanji_numbers) + r']\s*巻?\s*', number, text)
+    return _KANJI_RE.sub(lambda match_obj: f' {_KANJI_MAP[match_obj.group(1)]} ', text)
+
+
+def _circled_number_sub(match_obj: re.Match) -> str:
+    """
+    Convert a matched symbol number(e.g. `①`, `⑴`, `⒈`, `⓵`) to a zero-padded number.
+
+    Args:
+        match_obj (re.Match): Match object of `_CIRCLED_RE`.
+
+    Returns:
+        str: Zero-padded number with spaces on both sides.
+    """
+    code = ord(match_obj.group(1))
+    if 0x2460 <= code <= 0x2468:
+        number = code - 0x2460 + 1
+    elif 0x2474 <= code <= 0x247C:
+        number = code - 0x2474 + 1
+    elif 0x2488 <= code <= 0x2490:
+        number = code - 0x2488 + 1
+    else:
+        number = code - 0x24F5 + 1
 
-    return text
+    return f' {number:02d} '
 
 
 def format_book_author(book_author: str) -> str:
@@ -156,69 +224,191 @@ def format_book_title(book_title: str) -> str:
     Note:
         The format pattern will only works on EPub file.
     """
-    book_title = replace_fullwidth_alpha_numeral_to_halfwidth(book_title)
+    # Full-width characters, kanji numbers and symbol numbers never appear in ASCII-only title
+    is_ascii = book_title.isascii()
+
+    if not is_ascii:
+        book_title = replace_fullwidth_alpha_numeral_to_halfwidth(book_title)
     book_title = replace_unsafe_symbol_to_safe_symbol(book_title)
-    book_title = replace_fullwidth_round_brackets_to_halfwidth(book_title)
+    if not is_ascii:
+        book_title = replace_fullwidth_round_brackets_to_halfwidth(book_title)
 
     # Replace unnecessary characters
     # book_title = re.sub(r'【.+?】', '', book_title)
-    book_title = re.sub(r'【.+?(付き|増量版|無料版?|出版|誌版|特別版?|特典付き?|漫画付き?)】', '', book_title)
-    book_title = re.sub(r'[(＜〈].*?(BOOKS|Creative|DX版?|GAMES|JOKER|Network|NOVELS|NOVEL 0|Publishing|エイジ|エクストラ|コミック|シリーズ|ス|ノベルズ|ラノベ|限定版|小説|新装版|電子版|特典付き|特別版|文芸|文庫J?|編集部)[〉＞)]', '', book_title)
-    book_title = re.sub(r'[：:]', ' ', book_title)
-    book_title = re.sub(r'\s+', ' ', book_title)
+    book_title = _STRIP_RE.sub('', book_title)
+    book_title = _COLON_RE.sub(' ', book_title)
+    book_title = _WS_RE.sub(' ', book_title)
 
     # Pad number
     book_title = pad_numeric_only_string_enclosed_in_round_brackets(book_title)
-    book_title = pad_kanji_number(book_title)
-
-    # Padding symbol numbers
-    match_result = re.search(r'\s*([①-⑨])\s*巻?\s*', book_title)
-    if match_result:
-        number = f' {chr(ord(match_result.group(1)) - 0x242F).zfill(2)} '
-        book_title = re.sub(r'\s*[①-⑨]\s*巻?\s*', number, book_title)
-
-    match_result = re.search(r'\s*([⑴-⑼])\s*巻?\s*', book_title)
-    if match_result:
-        number = f' {chr(ord(match_result.group(1)) - 0x2443).zfill(2)} '
-        book_title = re.sub(r'\s*[⑴-⑼]\s*巻?\s*', number, book_title)
-
-    match_result = re.search(r'\s*([⒈-⒐])\s*巻?\s*', book_title)
-    if match_result:
-        number = f' {chr(ord(match_result.group(1)) - 0x2457).zfill(2)} '
-        book_title = re.sub(r'\s*[⒈-⒐]\s*巻?\s*', number, book_title)
+    if not is_ascii:
+        book_title = pad_kanji_number(book_title)
 
-    match_result = re.search(r'\s*([⓵-⓽])\s*巻?\s*', book_title)
-    if match_result:
-        number = f' {chr(ord(match_result.group(1)) - 0x24C4).zfill(2)} '
-        book_title = re.sub(r'\s*[⓵-⓽]\s*巻?\s*', number, book_title)
+        # Padding symbol numbers
+        book_title = _CIRCLED_RE.sub(_circled_number_sub, book_title)
 
     # Padding numeric-only string in front of the extension
     # e.g., xxx1巻.epub -> xxx 01.epub
     # e.g., xxx1.epub -> xxx 01.epub
-    match_result = re.search(r'(?<=\s)?(\d+)(?=巻?\s*\.epub)', book_title)
-    if match_result:
-        number = f' {str(int(match_result.group(1))).zfill(2)}'
-        book_title = re.sub(r'\s*\d+巻?\s*(?=\.epub)', number, book_title)
+    book_title = _TRAIL_NUM_RE.sub(lambda match_obj: f' {int(match_obj.group(1)):02d}', book_title)
 
-    # Remove spaces before extension
-    book_title = re.sub(r'\s+', ' ', book_title)
-    book_title = re.sub(r'\s+(?=\.epub)', '', book_title)
+    # Remove continuous spaces and spaces before extension
+    # Whitespaces are already replaced by a space above, and the padding only inserts spaces
+    if '  ' in book_title or ' .epub' in book_title:
+        book_title = _WS_BEFORE_EXT_RE.sub(lambda match_obj: match_obj.group(1) or ' ', book_title)
 
     return book_title
 
 
+def get_extract_path(output_dir: str, path_in_zip: str, path_module=os.path) -> str:
+    """
+    Get the path to extract the file in zip file to.
+
+    Sanitize the path in the same way as `zipfile.ZipFile.extract`.
+    Drive letters, absolute paths and parent directory components in the path are ignored.
+    On Windows, characters illegal in filenames are replaced by `_`, and trailing dots and spaces of each component are removed.
+
+    Args:
+        output_dir (str): Output directory.
+        path_in_zip (str): Path of the file in zip file.
+        path_module (module): Path module of the platform to extract on(e.g. ntpath). Defaults to os.path.
+
+    Returns:
+        str: Path to extract.
+    """
+    path = path_in_zip.replace('/', path_module.sep)
+    if path_module.altsep:
+        path = path.replace(path_module.altsep, path_module.sep)
+    path = path_module.splitdrive(path)[1]
+    components = [component for component in path.split(path_module.sep) if component not in ('', path_module.curdir, path_module.pardir)]
+    if path_module.sep == '\\':
+        components = [component.translate(_WINDOWS_ILLEGAL_CHARS_TABLE).rstrip(' .') for component in components]
+        components = [component for component in components if component]
+
+    return path_module.join(output_dir, *components)
+
+
+def get_images_in_epub(epub_file: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """
+    Get the images in EPub file.
+
+    Images in the `publicimage` directory(e.g. publisher's logo) are excluded.
+
+    Args:
+        epub_file (zipfile.ZipFile): EPub file.
+
+    Returns:
+        list[zipfile.ZipInfo]: Members of the images in EPub file.
+            Pass them to `zipfile.ZipFile.open` directly, so that the member is not looked up by name again.
+    """
+    return [
+        info for info in epub_file.infolist()
+        if info.filename.endswith(_IMAGE_EXTENSIONS) and not _EXCLUDE_IMAGE_RE.search(info.filename)
+    ]
+
+
+def extract_images(filepath: str, images_in_epub: list[zipfile.ZipInfo], output_dir: str):
+    """
+    Extract the images in EPub file in parallel.
+
+    Each thread opens the EPub file once, and extracts the images with it.
+    The images are handed to the threads in chunks, so that the overhead of each task is shared by the images in a chunk.
+
+    Args:
+        filepath (str): EPub file.
+        images_in_epub (list[zipfile.ZipInfo]): Members of the images in EPub file.
+        output_dir (str): Output directory.
+
+    Yields:
+        int: Number of the extracted images in each chunk, in the order of images_in_epub.
+    """
+    extract_paths = [get_extract_path(output_dir, image_in_epub.filename) for image_in_epub in images_in_epub]
+    for extract_directory in {os.path.dirname(extract_path) for extract_path in extract_paths}:
+        os.makedirs(extract_directory, exist_ok=True)
+
+    thread_local = threading.local()
+    epub_files = []
+
+    def extract_chunk(start: int) -> int:
+        if not hasattr(thread_local, 'epub_file'):
+            thread_local.epub_file = zipfile.ZipFile(filepath)
+            epub_files.append(thread_local.epub_file)
+        chunk = zip(images_in_epub[start:start + chunk_size], extract_paths[start:start + chunk_size])
+        for image_in_epub, extract_path in chunk:
+            with thread_local.epub_file.open(image_in_epub) as src, open(extract_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, _EXTRACT_BUFFER_SIZE)
+        return min(chunk_size, len(images_in_epub) - start)
+
+    # Make the chunks smaller for a few images, so that all threads have something to extract
+    workers = os.cpu_count() or 1
+    chunk_size = max(1, min(_EXTRACT_CHUNK_SIZE, len(images_in_epub) // workers))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(extract_chunk, range(0, len(images_in_epub), chunk_size))
+    finally:
+        for epub_file in epub_files:
+            epub_file.close()
+
+
+def _replace_with_retry(src: str, dst: str):
+    """
+    Rename the file or directory, retrying a few times when it is locked.
+
+    Args:
+        src (str): Path to rename.
+        dst (str): Path renamed to.
+
+    Raises:
+        OSError: Renaming failed on the last try.
+    """
+    for tries in range(1, _REPLACE_TRIES + 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if tries == _REPLACE_TRIES:
+                raise
+            time.sleep(_REPLACE_RETRY_INTERVAL)
+
+
+def _get_opf_parser_and_queries() -> threading.local:
+    # lxml parsers and XPath objects must not be shared between threads
+    if not hasattr(_opf_thread_local, 'parser'):
+        _opf_thread_local.parser = etree.XMLParser(remove_comments=False, encoding='utf-8')
+        _opf_thread_local.xp_title = etree.XPath('//ns:metadata/dc:title/text()', namespaces=_OPF_NAMESPACES)
+        _opf_thread_local.xp_author = etree.XPath('//ns:metadata/dc:creator/text()', namespaces=_OPF_NAMESPACES)
+        _opf_thread_local.xp_genre = etree.XPath("//ns:metadata/ns:meta[@name='book-type']/@content", namespaces=_OPF_NAMESPACES)
+        _opf_thread_local.xp_rootfile = etree.XPath('//n:rootfile/@full-path', namespaces=_CONTAINER_NAMESPACES)
+
+    return _opf_thread_local
+
+
+def read_opf_bytes(epub_file: zipfile.ZipFile) -> bytes:
+    """
+    Read EPub's OPF container XML.
+
+    The path of the OPF file is read from the rootfile in `META-INF/container.xml`.
+
+    Args:
+        epub_file (zipfile.ZipFile): EPub file.
+
+    Returns:
+        bytes: OPF container XML.
+    """
+    opf = _get_opf_parser_and_queries()
+    rootfile = opf.xp_rootfile(etree.XML(epub_file.read(_CONTAINER_XML_PATH), opf.parser))
+    if not rootfile:
+        raise ValueError(f'The rootfile was not found in {_CONTAINER_XML_PATH} of {epub_file.filename}')
+
+    return epub_file.read(rootfile[0])
+
+
 def get_epub_info(filepath: str) -> dict:
-    # metadata = epub_meta.get_epub_metadata(filepath)
-    # return metadata
-    parser = etree.XMLParser(remove_comments=False, encoding='utf-8')
-    epub_info_xml: etree.ElementTree = etree.XML(
-        epub_meta.get_epub_opf_xml(filepath),
-        parser
-    )
-    namespace = {
-        'ns': 'http://www.idpf.org/2007/opf',
-        'dc': 'http://purl.org/dc/elements/1.1/'
-    }
+    with zipfile.ZipFile(filepath) as epub_file:
+        opf_bytes = read_opf_bytes(epub_file)
+
+    opf = _get_opf_parser_and_queries()
+    epub_info_xml: etree.ElementTree = etree.XML(opf_bytes, opf.parser)
 
     # from xml.etree import ElementTree
     # updated_title = re.search(r'(?<=name="Updated_Title" content=")(.+?)(?=")', etree.tostring(epub_info_xml, encoding='CP932').decode('cp932'))
@@ -226,17 +416,114 @@ def get_epub_info(filepath: str) -> dict:
     #     title = updated_title.group(1)
     # else:
     #     title = epub_info_xml.xpath('//ns:metadata/dc:title/text()', namespaces=namespace)[0]
-    title = epub_info_xml.xpath('//ns:metadata/dc:title/text()', namespaces=namespace)[0]
-    author = epub_info_xml.xpath("//ns:metadata/dc:creator/text()", namespaces=namespace)
-    genre = epub_info_xml.xpath("//ns:metadata/ns:meta[@name='book-type']/@content", namespaces=namespace)
+    title = opf.xp_title(epub_info_xml)[0]
+    author = opf.xp_author(epub_info_xml)
+    genre = opf.xp_genre(epub_info_xml)
     ret_val = {
         'title': title,
-        'author': re.sub(r'( |　)', '', author[0]) if len(author) != 0 else 'NotFound',
+        'author': _AUTHOR_SPACE_RE.sub('', author[0]) if len(author) != 0 else 'NotFound',
         'genre': genre[0].upper() if genre else 'NotFound'
     }
     return ret_val
 
 
+class EPubInfoCache():
+    """On-disk cache of `get_epub_info` results.
+
+    The cache file(~/.cache/epub_info) is opened once when entering the context, and closed when exiting.
+    A cached result is used again while the modified time and the size of EPub file are not changed.
+    If the cache cannot be opened, read or written, or the cache is disabled, EPub info is read from the file instead.
+    Entries are never pruned, the entries of moved or deleted EPub files are left until the cache file is removed.
+
+    Usage:
+        with EPubInfoCache() as cache:
+            epub_info = cache.get_epub_info(filepath)
+    """
+
+    def __init__(self, cache_path: str = _EPUB_INFO_CACHE_PATH, enabled: bool = True):
+        self.cache_path = cache_path
+        self.enabled = enabled
+        self.cache = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            self.cache = shelve.open(self.cache_path)
+        except Exception as e:
+            logger.warning(f'Could not open the cache {self.cache_path}: {e}')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.cache is None:
+            return
+        try:
+            self.cache.close()
+        except Exception as e:
+            logger.warning(f'Could not write the cache {self.cache_path}: {e}')
+        self.cache = None
+
+    def __load(self, filepath: str, mtime_ns: int, size: int) -> Optional[dict]:
+        with self.lock:
+            try:
+                entry = self.cache.get(filepath)
+                if not entry or entry['mtime_ns'] != mtime_ns or entry['size'] != size:
+                    return None
+                return json.loads(entry['info'])
+            except Exception:
+                # The entry is broken, it will be overwritten
+                return None
+
+    def __store(self, filepath: str, mtime_ns: int, size: int, epub_info: dict):
+        with self.lock:
+            try:
+                self.cache[filepath] = {
+                    'mtime_ns': mtime_ns,
+                    'size': size,
+                    'info': json.dumps(epub_info, ensure_ascii=False)
+                }
+            except Exception as e:
+                logger.warning(f'Could not write the cache {self.cache_path}: {e}')
+
+    def get_epub_info(self, filepath: str) -> dict:
+        """
+        Get EPub info with cache.
+
+        Args:
+            filepath (str): EPub file.
+
+        Returns:
+            dict: EPub info.
+        """
+        if self.cache is None:
+            return get_epub_info(filepath)
+
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        epub_info = self.__load(filepath, stat.st_mtime_ns, stat.st_size)
+        if epub_info is None:
+            epub_info = get_epub_info(filepath)
+            self.__store(filepath, stat.st_mtime_ns, stat.st_size, epub_info)
+
+        return epub_info
+
+
+def count_images_in_epub(filepath: str) -> int:
+    """
+    Count the images in EPub file.
+
+    Args:
+        filepath (str): EPub file.
+
+    Returns:
+        int: Number of the images, same as the images to be extracted by `EPubInfo.unpack`.
+    """
+    with zipfile.ZipFile(filepath) as epub_file:
+        return len(get_images_in_epub(epub_file))
+
+
 class EPubInfo():
     """Class for EPub utilities."""
 
@@ -256,7 +543,7 @@ class EPubInfo():
 
         return is_valid
 
-    def __show_rename_args_is_valid(self, genre) -> bool:
+    def __show_rename_args_is_valid(self, genre, cache) -> bool:
         is_valid = True
 
         if not self.__common_args_is_valid():
@@ -267,6 +554,10 @@ class EPubInfo():
             logger.info('Input parameter is not valid. Try again.')
             is_valid = False
 
+        if not is_bool(cache):
+            logger.info('You must just type --cache or --nocache flag. No need to type a parameter.')
+            is_valid = False
+
         return is_valid
 
     def __unpack_args_is_valid(self, output_dir: str) -> bool:
@@ -281,19 +572,19 @@ class EPubInfo():
 
         return is_valid
 
-    def __get_filenames(self) -> list[str]:
-        if is_file(self.input_dir_or_file):
-            return [os.path.basename(self.input_dir_or_file)]
-
-        return os.listdir(self.input_dir_or_file)
-
-    def __get_dirname(self) -> str:
+    def __get_epub_filepaths(self) -> list[str]:
         if is_file(self.input_dir_or_file):
-            return os.path.dirname(self.input_dir_or_file)
+            return [self.input_dir_or_file]
 
-        return self.input_dir_or_file
+        # Skip directory or not an EPub file
+        # DirEntry caches the file type from the directory listing, so no stat is needed for each entry
+        with os.scandir(self.input_dir_or_file) as entries:
+            return [
+                entry.path for entry in entries
+                if not entry.is_dir() and entry.name.upper().endswith('.EPUB')
+            ]
 
-    def show_rename(self, genre: bool = True):
+    def show_rename(self, genre: bool = True, cache: bool = True):
         """Show rename command for EPub.
 
         Get the title and other information from EPub's OPF container XML, and build a rename command.
@@ -305,28 +596,29 @@ class EPubInfo():
             python src/epub_info.py show_rename -i "path/to/dir or file" --nogenre
                 Show rename command. but don't show the book's genre.
 
+            python src/epub_info.py show_rename -i "path/to/dir or file" --nocache
+                Show rename command. but read all EPub info from the files, without the cache.
+
             python src/epub_info.py show_rename -h
                 Show this help message.
 
         Note:
             It will NOT look recursively.
+            EPub info is cached in ~/.cache/epub_info, and used again while the EPub file is not changed.
+            The cache is never pruned. Remove the cache files to clear it.
         """
 
-        if not self.__show_rename_args_is_valid(genre):
+        if not self.__show_rename_args_is_valid(genre, cache):
             logger.info('Input parameter is not valid. Try again.')
             return
 
-        for filename in self.__get_filenames():
-            filepath = os.path.join(self.__get_dirname(), filename)
-
-            # Skip directory or not an EPub file
-            if os.path.isdir(filepath) or os.path.splitext(filepath)[1].upper() != '.EPUB':
-                continue
-
-            # Get EPub info
-            epub_info = get_epub_info(filepath)
+        # Get EPub info in parallel, and show them in the order of the files
+        filepaths = self.__get_epub_filepaths()
+        with EPubInfoCache(enabled=cache) as epub_info_cache, ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            epub_infos = executor.map(epub_info_cache.get_epub_info, filepaths)
 
-            print(f'{"Genre: " + epub_info.get("genre") + " " if genre else ""}rename "{os.path.basename(filepath)}" "[{format_book_author(epub_info.get("author"))}]{format_book_title(epub_info.get("title") + ".epub")}"'.encode('cp932', errors='backslashreplace').decode('cp932'))
+            for filepath, epub_info in zip(filepaths, epub_infos):
+                print(f'{"Genre: " + epub_info.get("genre") + " " if genre else ""}rename "{os.path.basename(filepath)}" "[{format_book_author(epub_info.get("author"))}]{format_book_title(epub_info.get("title") + ".epub")}"'.encode('cp932', errors='backslashreplace').decode('cp932'))
 
     def unpack(self, output_dir: str = ''):
         """Unpack all images in EPub file.
@@ -334,10 +626,10 @@ class EPubInfo():
         Unpack all images in EPub file.
 
         EPub file directory tree
-        -> {output_dir}/{{first_directory_name}}/{{second_directory_name}}/* Extracted EPub directory tree will look like this
-        -> {output_dir}/{book_title}/{{second_directory_name}}/*             Rename the first_directory_name to book's title
-        -> {output_dir}/{book_title}/*                                       Move files in the second_directory_name directory, directly below to the book's title directory
-        -> {output_dir}/{book_title}/*                                       Delete the directory where the images were stored
+        -> {output_dir}/.extracting-*/{{first_directory_name}}/{{second_directory_name}}/* Extracted EPub directory tree will look like this
+        -> {output_dir}/{book_title}/{{second_directory_name}}/*                           Rename the first_directory_name to book's title
+        -> {output_dir}/{book_title}/*                                                     Move files in the second_directory_name directory, directly below to the book's title directory
+        -> {output_dir}/{book_title}/*                                                     Delete the directory where the images were stored
 
         Usage:
             python src/epub_info.py unpack -i "path/to/dir or file" -o "path/to/output"
@@ -360,61 +652,59 @@ class EPubInfo():
             logger.info('Input parameter is not valid. Try again.')
             return
 
-        for filename in self.__get_filenames():
-            filepath = os.path.join(self.__get_dirname(), filename)
-            # Skip directory or not an EPub file
-            if os.path.isdir(filepath) or os.path.splitext(filepath)[1].upper() != '.EPUB':
+        for filepath in self.__get_epub_filepaths():
+            basename_without_ext = os.path.splitext(os.path.basename(filepath))[0]
+            if os.path.exists(os.path.join(output_dir, basename_without_ext)):
+                logger.error(f'{os.path.join(output_dir, basename_without_ext)} already exists. Skip {basename_without_ext}')
                 continue
 
-            with zipfile.ZipFile(filepath, mode='r', compression=zipfile.ZIP_DEFLATED, allowZip64=False) as epub_file:
-                basename_without_ext = os.path.splitext(os.path.basename(filepath))[0]
-
-                # Extract image files in EPub file
-                logger.info('\n' + ('#' * 25))
-                logger.info(f'EXTRACTING... {basename_without_ext}')
-                imagepaths_in_epub = [
-                    path.filename for path in epub_file.filelist
-                    if path.filename.endswith(('.jpg', '.jpeg', '.png', '.gif')) and not re.search(r'[\\\/]public(image|_image| image)s?', path.filename)
-                ]
-                with alive_bar(len(imagepaths_in_epub), bar='filling') as bar:
-                    for imagepath_in_epub in imagepaths_in_epub:
-                        epub_file._extract_member(imagepath_in_epub, output_dir, None)
-                        bar()
-                # epub_file.extractall(output_dir, imagepaths_in_epub)
-                logger.info(f'EXTRACT COMPLETE! {basename_without_ext}')
-
-                # Rename the first directory name to book's title
-                first_directory_name = imagepaths_in_epub[0].split('/')[0]
-                while True:
-                    try:
-                        before_filename = os.path.join(output_dir, first_directory_name)
-                        after_filename = os.path.join(output_dir, basename_without_ext)
-                        os.rename(before_filename, after_filename)
-                        logger.info(f'Rename {before_filename} -> {after_filename}')
-                        break
-                    except OSError:
-                        logger.error('Exception occurred in renaming...')
-                        logger.error('Try again...')
-                        time.sleep(1)
-
-                # Move the images in the directory to directly below to the book's title directory
-                second_directory_name = imagepaths_in_epub[0].split('/')[1]
-                images_to_move = glob.glob(os.path.join(glob.escape(os.path.join(output_dir, basename_without_ext, second_directory_name)), '*'))
-                logger.info(f'Move {os.path.join(output_dir, basename_without_ext, second_directory_name, "*.jpg")} -> {os.path.join(output_dir, basename_without_ext, "*.jpg")}')
-                for filename in images_to_move:
-                    shutil.move(filename, os.path.join(output_dir, basename_without_ext, os.path.basename(filename)))
-
-                # Delete image directory
-                while True:
-                    delete_directory = os.path.join(output_dir, basename_without_ext, second_directory_name)
-                    logger.info(f'Delete {delete_directory}')
-                    try:
-                        os.rmdir(delete_directory)
-                        break
-                    except OSError:
-                        logger.error('Exception occurred at deleting...')
-                        logger.error('Try again...')
-                        time.sleep(1)
+            # Extract image files in EPub file
+            # Extract into a new directory, so that the files already in output_dir are never renamed or removed
+            logger.info('\n' + ('#' * 25))
+            logger.info(f'EXTRACTING... {basename_without_ext}')
+            with zipfile.ZipFile(filepath) as epub_file:
+                images_in_epub = get_images_in_epub(epub_file)
+            extract_dir = tempfile.mkdtemp(prefix='.extracting-', dir=output_dir)
+            with alive_bar(len(images_in_epub), bar='filling') as bar:
+                for extracted_count in extract_images(filepath, images_in_epub, extract_dir):
+                    bar(extracted_count)
+            logger.info(f'EXTRACT COMPLETE! {basename_without_ext}')
+
+            # Rename the first directory name to book's title
+            first_directory_name = images_in_epub[0].filename.split('/')[0]
+            before_filename = os.path.join(extract_dir, first_directory_name)
+            after_filename = os.path.join(output_dir, basename_without_ext)
+            try:
+                _replace_with_retry(before_filename, after_filename)
+            except OSError as e:
+                logger.error(f'Exception occurred in renaming {before_filename} -> {after_filename}: {e}')
+                logger.error(f'Skip {basename_without_ext}')
+                # Remove the images extracted from this book only
+                shutil.rmtree(extract_dir, ignore_errors=True)
+                continue
+            try:
+                os.rmdir(extract_dir)
+            except OSError:
+                # Images outside of the first directory are left
+                logger.warning(f'Some images are left in {extract_dir}')
+            logger.info(f'Rename {before_filename} -> {after_filename}')
+
+            # Move the images in the directory to directly below to the book's title directory
+            second_directory_name = images_in_epub[0].filename.split('/')[1]
+            src_directory = os.path.join(output_dir, basename_without_ext, second_directory_name)
+            dst_directory = os.path.join(output_dir, basename_without_ext)
+            logger.info(f'Move {os.path.join(src_directory, "*.jpg")} -> {os.path.join(dst_directory, "*.jpg")}')
+            for filename in os.listdir(src_directory):
+                os.replace(os.path.join(src_directory, filename), os.path.join(dst_directory, filename))
+
+            # Delete image directory
+            delete_directory = os.path.join(output_dir, basename_without_ext, second_directory_name)
+            logger.info(f'Delete {delete_directory}')
+            try:
+                os.rmdir(delete_directory)
+            except OSError:
+                # Something is left in the directory
+                shutil.rmtree(delete_directory, ignore_errors=True)
 
     def count_image(self):
         """Count images in EPub file.
@@ -434,18 +724,14 @@ class EPubInfo():
             logger.info('Input parameter is not valid. Try again.')
             return
 
-        for filename in self.__get_filenames():
-            filepath = os.path.join(self.__get_dirname(), filename)
-            # Skip directory or not an EPub file
-            if os.path.isdir(filepath) or os.path.splitext(filepath)[1].upper() != '.EPUB':
-                continue
+        # Count images in parallel, and show them in the order of the files
+        filepaths = self.__get_epub_filepaths()
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            image_counts = executor.map(count_images_in_epub, filepaths)
 
-            with zipfile.ZipFile(filepath) as epub_file:
+            for filepath, image_count in zip(filepaths, image_counts):
                 basename_without_ext = os.path.splitext(os.path.basename(filepath))[0]
-                imagepaths_in_epub = [
-                    path.filename for path in epub_file.filelist if path.filename.endswith(('.jpg', '.jpeg', '.png'))
-                ]
-                print(f'{len(imagepaths_in_epub): 4}: {basename_without_ext}')
+                print(f'{image_count: 4}: {basename_without_ext}')
 
 
 def main():
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules in src import each other by their bare names(e.g. `from utils import setup_logger`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
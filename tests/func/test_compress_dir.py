@@ -0,0 +1,91 @@
+import io
+import os
+import subprocess
+import tarfile
+import zipfile
+import pytest
+from src import compress_dir
+from src.compress_dir import CompressDir, make_tarzst, make_zip
+
+
+def _make_dir_to_compress(root_dir):
+    os.makedirs(root_dir / 'sub')
+    (root_dir / 'a.txt').write_bytes(b'a' * 1000)
+    (root_dir / 'sub' / 'b.txt').write_bytes(b'b')
+
+
+def _read_tar(fileobj):
+    with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar if member.isfile()}
+
+
+def test_make_zip__files_should_be_compressed(tmp_path):
+    _make_dir_to_compress(tmp_path / 'book')
+
+    archive_filename = make_zip(str(tmp_path / 'book'), str(tmp_path / 'book'), compress_level=9)
+    with zipfile.ZipFile(archive_filename) as zip_file:
+        ret_val = (archive_filename, {name: zip_file.read(name) for name in zip_file.namelist() if not name.endswith('/')})
+    expected_val = (str(tmp_path / 'book') + '.zip', {'a.txt': b'a' * 1000, 'sub/b.txt': b'b'})
+    assert ret_val == expected_val
+
+
+def test_make_tarzst__files_should_be_compressed_with_zstandard(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    _make_dir_to_compress(tmp_path / 'book')
+
+    archive_filename = make_tarzst(str(tmp_path / 'book'), str(tmp_path / 'book'), compress_level=19, threads=2)
+    with open(archive_filename, 'rb') as fp, zstandard.ZstdDecompressor().stream_reader(fp) as reader:
+        ret_val = (archive_filename, _read_tar(reader))
+    expected_val = (str(tmp_path / 'book') + '.tar.zst', {'a.txt': b'a' * 1000, 'sub/b.txt': b'b'})
+    assert ret_val == expected_val
+
+
+def test_make_tarzst__files_should_be_compressed_with_zstd_command(tmp_path, monkeypatch):
+    if not compress_dir.ZSTD_COMMAND:
+        pytest.skip('zstd command is not installed')
+    monkeypatch.setattr(compress_dir, 'zstandard', None)
+    _make_dir_to_compress(tmp_path / 'book')
+
+    # Level 22 needs the --ultra option
+    archive_filename = make_tarzst(str(tmp_path / 'book'), str(tmp_path / 'book'), compress_level=22, threads=1)
+    decompressed = subprocess.run([compress_dir.ZSTD_COMMAND, '-d', '-c', archive_filename], stdout=subprocess.PIPE, check=True).stdout
+    ret_val = (archive_filename, _read_tar(io.BytesIO(decompressed)))
+    expected_val = (str(tmp_path / 'book') + '.tar.zst', {'a.txt': b'a' * 1000, 'sub/b.txt': b'b'})
+    assert ret_val == expected_val
+
+
+def test_input_is_valid__compress_level_in_range_should_return_true(tmp_path):
+    ret_val = [
+        CompressDir(str(tmp_path), format_type='zip', compress_level=0)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='zip', compress_level=9)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='tzst', compress_level=1)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='tzst', compress_level=22)._input_is_valid(),
+    ]
+    expected_val = [True] * 4
+    assert ret_val == expected_val
+
+
+def test_input_is_valid__compress_level_out_of_range_should_return_false(tmp_path):
+    ret_val = [
+        CompressDir(str(tmp_path), format_type='zip', compress_level=-1)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='zip', compress_level=10)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='tzst', compress_level=0)._input_is_valid(),
+        CompressDir(str(tmp_path), format_type='tzst', compress_level=23)._input_is_valid(),
+    ]
+    expected_val = [False] * 4
+    assert ret_val == expected_val
+
+
+def test_input_is_valid__non_positive_workers_should_return_false(tmp_path):
+    ret_val = [
+        CompressDir(str(tmp_path), workers=-1)._input_is_valid(),
+        CompressDir(str(tmp_path), workers='2')._input_is_valid(),
+    ]
+    expected_val = [False] * 2
+    assert ret_val == expected_val
+
+
+def test_input_is_valid__unsupported_format_type_should_return_false(tmp_path):
+    ret_val = CompressDir(str(tmp_path), format_type='zst')._input_is_valid()
+    expected_val = False
+    assert ret_val == expected_val
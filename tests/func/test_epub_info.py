@@ -0,0 +1,330 @@
+import ntpath
+import os
+import zipfile
+import pytest
+from src import epub_info
+from src.epub_info import (
+    EPubInfo,
+    pad_kanji_number,
+    replace_fullwidth_alpha_numeral_to_halfwidth,
+    replace_unsafe_symbol_to_safe_symbol,
+    replace_fullwidth_round_brackets_to_halfwidth,
+    format_book_title,
+    pad_numeric_only_string_enclosed_in_round_brackets,
+    get_extract_path,
+    read_opf_bytes,
+)
+
+
+def test_pad_kanji_number__kanji_number_should_be_padded():
+    ret_val = pad_kanji_number('xxx 壱巻 yyy.epub')
+    expected_val = 'xxx 1 yyy.epub'
+    assert ret_val == expected_val
+
+
+def test_pad_kanji_number__pipe_should_not_be_matched():
+    ret_val = pad_kanji_number('a|b')
+    expected_val = 'a|b'
+    assert ret_val == expected_val
+
+
+def test_replace_fullwidth_alpha_numeral_to_halfwidth__fullwidth_should_be_halfwidth():
+    ret_val = replace_fullwidth_alpha_numeral_to_halfwidth('ＡＢＣｘｙｚ０９ テスト')
+    expected_val = 'ABCxyz09 テスト'
+    assert ret_val == expected_val
+
+
+def test_replace_unsafe_symbol_to_safe_symbol__unsafe_symbol_should_be_fullwidth():
+    ret_val = replace_unsafe_symbol_to_safe_symbol('<>:"/\\|!?*a')
+    expected_val = '＜＞：＂／＼｜！？＊a'
+    assert ret_val == expected_val
+
+
+def test_replace_fullwidth_round_brackets_to_halfwidth__fullwidth_brackets_should_be_halfwidth():
+    ret_val = replace_fullwidth_round_brackets_to_halfwidth('（１）')
+    expected_val = '(１)'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__each_symbol_number_should_be_padded_with_its_own_number():
+    ret_val = format_book_title('夢①②.epub')
+    expected_val = '夢 01 02.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__all_kinds_of_symbol_number_should_be_padded():
+    ret_val = [format_book_title(f'タイトル{symbol_number}巻.epub') for symbol_number in '⑨⑼⒐⓽']
+    expected_val = ['タイトル 09.epub'] * 4
+    assert ret_val == expected_val
+
+
+def test_format_book_title__each_number_in_round_brackets_should_be_padded_with_its_own_number():
+    ret_val = format_book_title('A (1) b (2) c.epub')
+    expected_val = 'A 01 b 02 c.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__number_in_round_brackets_before_extension_should_be_padded():
+    ret_val = format_book_title('タイトル（１）.epub')
+    expected_val = 'タイトル 01.epub'
+    assert ret_val == expected_val
+
+
+def test_pad_numeric_only_string_enclosed_in_round_brackets__number_followed_by_other_character_should_not_be_padded():
+    ret_val = pad_numeric_only_string_enclosed_in_round_brackets(' aa(12)(1) ')
+    expected_val = ' aa(12) 01 '
+    assert ret_val == expected_val
+
+
+def test_pad_numeric_only_string_enclosed_in_round_brackets__number_without_space_should_not_be_padded():
+    ret_val = pad_numeric_only_string_enclosed_in_round_brackets('Vol (1)x.epub')
+    expected_val = 'Vol (1)x.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__kanji_number_should_be_padded():
+    ret_val = format_book_title('タイトル 壱巻.epub')
+    expected_val = 'タイトル 01.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__number_before_extension_should_be_padded():
+    ret_val = format_book_title('タイトル 7巻.epub')
+    expected_val = 'タイトル 07.epub'
+    assert ret_val == expected_val
+
+
+def test_get_extract_path__path_should_be_joined_to_output_dir():
+    ret_val = get_extract_path('out', 'item/image/i-001.jpg')
+    expected_val = os.path.join('out', 'item', 'image', 'i-001.jpg')
+    assert ret_val == expected_val
+
+
+def test_get_extract_path__absolute_and_parent_directory_should_be_ignored():
+    ret_val = get_extract_path('out', '/item/../image/./i-001.jpg')
+    expected_val = os.path.join('out', 'item', 'image', 'i-001.jpg')
+    assert ret_val == expected_val
+
+
+def test_format_book_title__label_should_not_match_across_closing_bracket():
+    ret_val = format_book_title('Foo (1) bar (BOOKS).epub')
+    expected_val = 'Foo 01 bar.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__label_without_prefix_should_be_removed():
+    ret_val = format_book_title('タイトル【無料版】 1.epub')
+    expected_val = 'タイトル 01.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__label_should_not_remove_other_brackets():
+    ret_val = format_book_title('x【限定】y【無料版】z.epub')
+    expected_val = 'x【限定】yz.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__spaces_should_be_collapsed_and_removed_before_extension():
+    ret_val = format_book_title('Title  with \t spaces .epub')
+    expected_val = 'Title with spaces.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__fullwidth_space_should_be_replaced_to_space():
+    ret_val = format_book_title('タイトル　副題.epub')
+    expected_val = 'タイトル 副題.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__clean_title_should_not_be_changed():
+    ret_val = format_book_title('Plain English Title.epub')
+    expected_val = 'Plain English Title.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__ascii_title_should_strip_label_and_pad_number():
+    ret_val = format_book_title('Foo (BOOKS) 3.epub')
+    expected_val = 'Foo 03.epub'
+    assert ret_val == expected_val
+
+
+def test_format_book_title__ascii_title_should_replace_unsafe_symbol():
+    ret_val = format_book_title('a:b?c*<d>.epub')
+    expected_val = 'a b？c＊＜d＞.epub'
+    assert ret_val == expected_val
+
+
+def _make_container_epub(filepath, container_xml, opf_paths=()):
+    with zipfile.ZipFile(filepath, 'w') as epub_file:
+        epub_file.writestr('META-INF/container.xml', container_xml)
+        for opf_path in opf_paths:
+            epub_file.writestr(opf_path, f'<package>{opf_path}</package>')
+
+
+def _read_opf_bytes_in(filepath):
+    with zipfile.ZipFile(filepath) as epub_file:
+        return read_opf_bytes(epub_file)
+
+
+def test_read_opf_bytes__opf_in_rootfile_should_be_returned(tmp_path):
+    filepath = tmp_path / 'book.epub'
+    _make_container_epub(filepath, (
+        '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+        '<rootfiles><rootfile full-path="item/standard.opf"/></rootfiles>'
+        '</container>'
+    ), ['item/standard.opf'])
+
+    ret_val = _read_opf_bytes_in(filepath)
+    expected_val = b'<package>item/standard.opf</package>'
+    assert ret_val == expected_val
+
+
+def test_read_opf_bytes__full_path_in_comment_should_be_ignored(tmp_path):
+    filepath = tmp_path / 'book.epub'
+    _make_container_epub(filepath, (
+        '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+        '<!-- full-path="old.opf" -->'
+        '<rootfiles><rootfile full-path="item/standard.opf"/></rootfiles>'
+        '</container>'
+    ), ['item/standard.opf'])
+
+    ret_val = _read_opf_bytes_in(filepath)
+    expected_val = b'<package>item/standard.opf</package>'
+    assert ret_val == expected_val
+
+
+def test_read_opf_bytes__escaped_full_path_should_be_unescaped(tmp_path):
+    filepath = tmp_path / 'book.epub'
+    _make_container_epub(filepath, (
+        '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+        '<rootfiles><rootfile full-path="a&amp;b/c.opf"/></rootfiles>'
+        '</container>'
+    ), ['a&b/c.opf'])
+
+    ret_val = _read_opf_bytes_in(filepath)
+    expected_val = b'<package>a&b/c.opf</package>'
+    assert ret_val == expected_val
+
+
+def test_read_opf_bytes__no_rootfile_should_raise_value_error(tmp_path):
+    filepath = tmp_path / 'book.epub'
+    _make_container_epub(filepath, '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"/>')
+
+    with pytest.raises(ValueError):
+        _read_opf_bytes_in(filepath)
+
+
+def test_get_extract_path__windows_illegal_characters_should_be_sanitized():
+    ret_val = get_extract_path('out', 'C:/item/ima:ge. /i-001?.jpg', path_module=ntpath)
+    expected_val = 'out\\item\\ima_ge\\i-001_.jpg'
+    assert ret_val == expected_val
+
+
+def _make_epub(filepath, image_names):
+    with zipfile.ZipFile(filepath, 'w') as epub_file:
+        for image_name in image_names:
+            epub_file.writestr(f'item/image/{image_name}', b'image')
+
+
+def test_unpack__images_should_be_moved_to_book_title_directory(tmp_path):
+    os.makedirs(tmp_path / 'in')
+    os.makedirs(tmp_path / 'out')
+    _make_epub(tmp_path / 'in' / 'Book.epub', ['i-001.jpg', 'i-002.jpg'])
+
+    EPubInfo(str(tmp_path / 'in')).unpack(str(tmp_path / 'out'))
+    ret_val = (sorted(os.listdir(tmp_path / 'out')), sorted(os.listdir(tmp_path / 'out' / 'Book')))
+    expected_val = (['Book'], ['i-001.jpg', 'i-002.jpg'])
+    assert ret_val == expected_val
+
+
+def test_unpack__rename_failure_should_not_remove_existing_files(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'in')
+    os.makedirs(tmp_path / 'out' / 'item')
+    (tmp_path / 'out' / 'item' / 'mine.txt').write_bytes(b'mine')
+    _make_epub(tmp_path / 'in' / 'Book.epub', ['i-001.jpg'])
+
+    replaced = []
+    os_replace = os.replace
+
+    def locked_replace(src, dst):
+        if os.path.basename(src) == 'item':
+            replaced.append(src)
+            raise PermissionError('locked')
+        os_replace(src, dst)
+
+    monkeypatch.setattr(epub_info.os, 'replace', locked_replace)
+    monkeypatch.setattr(epub_info, '_REPLACE_RETRY_INTERVAL', 0)
+    EPubInfo(str(tmp_path / 'in')).unpack(str(tmp_path / 'out'))
+    ret_val = (len(replaced), sorted(os.listdir(tmp_path / 'out')), sorted(os.listdir(tmp_path / 'out' / 'item')))
+    expected_val = (3, ['item'], ['mine.txt'])
+    assert ret_val == expected_val
+
+
+@pytest.fixture
+def read_epub_infos(monkeypatch):
+    read_filepaths = []
+
+    def get_epub_info(filepath):
+        read_filepaths.append(filepath)
+        return {'title': os.path.basename(filepath), 'author': 'Author', 'genre': 'NotFound'}
+
+    monkeypatch.setattr(epub_info, 'get_epub_info', get_epub_info)
+    return read_filepaths
+
+
+def test_epub_info_cache__unchanged_file_should_be_read_once(tmp_path, read_epub_infos):
+    filepath = tmp_path / 'book.epub'
+    filepath.write_bytes(b'epub')
+    cache_path = str(tmp_path / 'cache' / 'epub_info')
+
+    with epub_info.EPubInfoCache(cache_path) as cache:
+        first_epub_info = cache.get_epub_info(str(filepath))
+        cache.get_epub_info(str(filepath))
+    with epub_info.EPubInfoCache(cache_path) as cache:
+        ret_val = (cache.get_epub_info(str(filepath)), len(read_epub_infos))
+    expected_val = (first_epub_info, 1)
+    assert ret_val == expected_val
+
+
+def test_epub_info_cache__changed_file_should_be_read_again(tmp_path, read_epub_infos):
+    filepath = tmp_path / 'book.epub'
+    filepath.write_bytes(b'epub')
+    cache_path = str(tmp_path / 'cache' / 'epub_info')
+
+    with epub_info.EPubInfoCache(cache_path) as cache:
+        cache.get_epub_info(str(filepath))
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        cache.get_epub_info(str(filepath))
+        filepath.write_bytes(b'longer epub')
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        cache.get_epub_info(str(filepath))
+    ret_val = len(read_epub_infos)
+    expected_val = 3
+    assert ret_val == expected_val
+
+
+def test_epub_info_cache__unopenable_cache_should_read_file(tmp_path, read_epub_infos):
+    filepath = tmp_path / 'book.epub'
+    filepath.write_bytes(b'epub')
+    # The parent of the cache is a file, so the cache cannot be created
+    (tmp_path / 'cache').write_bytes(b'')
+
+    with epub_info.EPubInfoCache(str(tmp_path / 'cache' / 'epub_info')) as cache:
+        cache.get_epub_info(str(filepath))
+        cache.get_epub_info(str(filepath))
+    ret_val = len(read_epub_infos)
+    expected_val = 2
+    assert ret_val == expected_val
+
+
+def test_epub_info_cache__disabled_cache_should_not_be_created(tmp_path, read_epub_infos):
+    filepath = tmp_path / 'book.epub'
+    filepath.write_bytes(b'epub')
+
+    with epub_info.EPubInfoCache(str(tmp_path / 'cache' / 'epub_info'), enabled=False) as cache:
+        cache.get_epub_info(str(filepath))
+        cache.get_epub_info(str(filepath))
+    ret_val = (len(read_epub_infos), os.path.exists(tmp_path / 'cache'))
+    expected_val = (2, False)
+    assert ret_val == expected_val